@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark for cmd-center.
+
+Generates synthetic XDG/PATH/config fixtures in a temp dir, points HOME,
+XDG_CACHE_HOME, PATH and CMD_CENTER_DATA_DIRS at them (no host binaries,
+apps or icon themes are read), replaces rofi with a stub and times each
+stage (cold + warm) plus end-to-end runs of main.py. Results are written
+as JSON so runs can be compared with --compare.
+
+    python3 benchmarks/bench.py --apps 1500 --bins 20000 --out before.json
+    python3 benchmarks/bench.py --out after.json --compare before.json
+"""
+import os, sys, json, time, random, shutil, tempfile, argparse, statistics, subprocess, tracemalloc, platform
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Shell builtins only: PATH holds nothing but the fixtures
+ROFI_STUB = "#!/bin/sh\nwhile read -r _; do :; done\n"
+
+def parse_args():
+    p = argparse.ArgumentParser(description="cmd-center benchmark harness")
+    p.add_argument("--apps", type=int, default=1500, help="number of .desktop files")
+    p.add_argument("--bins", type=int, default=20000, help="number of PATH binaries")
+    p.add_argument("--path-dirs", type=int, default=10, help="PATH dirs the binaries are spread over")
+    p.add_argument("--menu-depth", type=int, default=4)
+    p.add_argument("--menu-width", type=int, default=6)
+    p.add_argument("--config-files", type=int, default=5000, help="files under the editor_paths tree")
+    p.add_argument("--history", type=int, default=100000, help="history entries")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--compare", help="previous results JSON to diff against")
+    p.add_argument("--keep", action="store_true", help="keep the fixture dir")
+    return p.parse_args()
+
+# --- FIXTURES ---
+def make_fixtures(root, a):
+    rnd = random.Random(a.seed)
+    home = os.path.join(root, "home")
+    apps_dir = os.path.join(home, ".local/share/applications")
+    os.makedirs(apps_dir)
+    for i in range(a.apps):
+        with open(os.path.join(apps_dir, f"app{i}.desktop"), "w") as f:
+            f.write(f"[Desktop Entry]\nType=Application\nName=App {i}\nComment=Synthetic\nExec=app{i} %U\nIcon=app-icon-{i % 50}\nTerminal=false\n")
+
+    path_dirs = []
+    for k in range(a.path_dirs):
+        d = os.path.join(root, f"bin{k}")
+        os.makedirs(d)
+        path_dirs.append(d)
+    for i in range(a.bins):
+        fp = os.path.join(path_dirs[i % a.path_dirs], f"tool{i}")
+        with open(fp, "w") as f: f.write("#!/bin/sh\n")
+        os.chmod(fp, 0o755)
+    stub = os.path.join(root, "stub")
+    os.makedirs(stub)
+    with open(os.path.join(stub, "rofi"), "w") as f: f.write(ROFI_STUB)
+    os.chmod(os.path.join(stub, "rofi"), 0o755)
+    # The interpreter's own dir may be /usr/bin; expose just the interpreter
+    os.symlink(sys.executable, os.path.join(stub, "python3"))
+
+    def menu(depth):
+        if depth == 0: return {f"Cmd {j}": f"echo {j}" for j in range(a.menu_width)}
+        return {f"Cat {depth}.{j}": {"icon": "📁", "items": menu(depth - 1)} for j in range(a.menu_width)}
+
+    dots = os.path.join(home, "dots")
+    for i in range(a.config_files):
+        sub = os.path.join(dots, *[f"d{rnd.randrange(8)}" for _ in range(rnd.randrange(1, 5))])
+        os.makedirs(sub, exist_ok=True)
+        open(os.path.join(sub, f"file{i}.conf"), "w").close()
+    for junk in (".git/objects", "node_modules/pkg", ".cache/x"):
+        os.makedirs(os.path.join(dots, junk), exist_ok=True)
+        for i in range(200): open(os.path.join(dots, junk, f"j{i}"), "w").close()
+
+    conf_dir = os.path.join(home, ".config/cmd-center")
+    os.makedirs(conf_dir)
+    with open(os.path.join(conf_dir, "config.json"), "w") as f:
+        json.dump({"settings": {"editor_paths": ["~/dots"]}, "menu": menu(a.menu_depth)}, f)
+
+    now, namespaces = time.time(), ["RUN", "APPS", "CONFIG", "HOME"]
+    hist = {}
+    for i in range(a.history):
+        ns = namespaces[i % len(namespaces)]
+        hist.setdefault(ns, {})[f"item{i}"] = [rnd.random() * 20, now - rnd.random() * 90 * 86400]
+    with open(os.path.join(conf_dir, "state.json"), "w") as f:
+        json.dump({"history": hist, "last_path": []}, f)
+
+    env = {
+        "HOME": home, "XDG_CACHE_HOME": os.path.join(root, "cache"),
+        "XDG_RUNTIME_DIR": root, "PATH": os.pathsep.join([stub, *path_dirs]),
+        "CMD_CENTER_DATA_DIRS": os.path.dirname(apps_dir),
+    }
+    return env
+
+# --- MEASUREMENT ---
+def measure(fn, repeat, setup=None):
+    # Timed runs go untraced (tracemalloc slows allocation-heavy stages
+    # several-fold); peak memory comes from one extra traced run
+    times = []
+    for _ in range(repeat):
+        if setup: setup()
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    if setup: setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"min_ms": min(times) * 1e3, "median_ms": statistics.median(times) * 1e3, "peak_kb": peak / 1024}
+
+# Runs main.py and records that run's own peak RSS. ru_maxrss can't be used:
+# Linux carries the spawning parent's peak across fork/exec into every child.
+PEAK_WRAPPER = """
+import atexit, os, runpy, sys
+def _peak():
+    with open("/proc/self/status") as f:
+        kb = next(l.split()[1] for l in f if l.startswith("VmHWM:"))
+    with open(os.environ["BENCH_PEAK_FILE"], "w") as f: f.write(kb)
+atexit.register(_peak)
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+def saturated_profile(hold=1.0):
+    """
+    A profile with more ready steps than slots behind a long wait=true step.
+    The scheduler should sleep until the step exits, so cpu_ms stays near 0.
+    """
+    from modules import scheduler
+    slow = lambda: os.posix_spawn(sys.executable, [sys.executable, "-c", f"import time; time.sleep({hold})"], os.environ)
+    start = lambda cmd: slow() if cmd == "slow" else None
+    cpu, t = time.process_time(), time.perf_counter()
+    scheduler.run([{"cmd": "slow", "wait": True}, "a", "b", {"cmd": "c", "delay": 0.1}], start, limit=1)
+    ms = (time.perf_counter() - t) * 1e3
+    return {"min_ms": ms, "median_ms": ms, "peak_kb": 0, "cpu_ms": (time.process_time() - cpu) * 1e3}
+
+def end_to_end(mode, env, repeat):
+    cmd = [sys.executable, "-c", PEAK_WRAPPER, os.path.join(REPO, "main.py")] + ([mode] if mode else [])
+    times, peaks = [], []
+    with tempfile.NamedTemporaryFile() as peak:
+        for _ in range(repeat):
+            open(peak.name, "w").close()
+            t = time.perf_counter()
+            subprocess.run(cmd, env={**os.environ, **env, "BENCH_PEAK_FILE": peak.name},
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120)
+            times.append(time.perf_counter() - t)
+            try: peaks.append(int(open(peak.name).read()))
+            except (OSError, ValueError): pass
+    return {"min_ms": min(times) * 1e3, "median_ms": statistics.median(times) * 1e3,
+            "peak_kb": max(peaks, default=0)}
+
+def run(a):
+    root = tempfile.mkdtemp(prefix="cmd-center-bench-")
+    try:
+        env = make_fixtures(root, a)
+        os.environ.update(env)
+        sys.path.insert(0, REPO)
+        # Imported late: module-level paths are derived from HOME/XDG_*
+        from modules import config, scanner, engine, frecency, journal, query
+
+        cfg = config.load_json(config.CONFIG_PATH)
+        settings, menu = cfg["settings"], cfg["menu"]
+        drop = lambda name: lambda: os.path.exists(config.cache_path(name)) and os.remove(config.cache_path(name))
+        r = a.repeat
+        stages = {
+            "apps_cold": measure(scanner.get_system_apps, r, drop("apps")),
+            "apps_warm": measure(scanner.get_system_apps, r),
+            "bins_cold": measure(scanner.get_binaries, r, drop("bins")),
+            "bins_warm": measure(scanner.get_binaries, r),
+            "config_walk_cold": measure(lambda: scanner.get_config_files(settings), r, drop("configs")),
+            "config_walk_warm": measure(lambda: scanner.get_config_files(settings), r),
+            "flat_menu": measure(lambda: engine.get_flat_menu(menu), r),
+            "menu_index_cold": measure(engine.load_menu_index, r, engine._menu_memo.clear),
+            "menu_index_warm": measure(engine.load_menu_index, r),
+            "state_load": measure(journal.load, r),
+        }
+        weights = journal.load()["history"]
+        bins = scanner.get_binaries()
+        stages["sort_run"] = measure(lambda: engine.rank(scanner.bin_entry(x, "", (frecency.score(weights, "RUN", x), x.lower())) for x in bins), r)
+        rows = query.collect("all", settings, weights, engine.load_menu_index())
+        stages["query_index"] = measure(lambda: query.build_index([r[1] for r in rows]), r)
+        stages["query"] = measure(lambda: query.search("tool12", limit=10, rows=rows, settings=settings, weights=weights), r)
+        stages["profile_saturated"] = saturated_profile()
+        for mode in (None, "apps", "run", "config"):
+            stages[f"e2e_{mode or 'hub'}"] = end_to_end(mode, env, r)
+        return stages
+    finally:
+        if a.keep: print(f"fixtures kept in {root}")
+        else: shutil.rmtree(root, ignore_errors=True)
+
+def main():
+    a = parse_args()
+    stages = run(a)
+    result = {
+        "meta": {"params": {k: v for k, v in vars(a).items() if k not in ("out", "compare", "keep")},
+                 "python": platform.python_version(), "platform": platform.platform(), "time": time.time()},
+        "stages": stages,
+    }
+    prev = json.load(open(a.compare))["stages"] if a.compare else {}
+    print(f"{'stage':<20}{'median ms':>12}{'min ms':>10}{'peak KiB':>12}{'vs prev':>10}")
+    for name, s in stages.items():
+        delta = ""
+        if name in prev and prev[name]["median_ms"]:
+            delta = f"{(s['median_ms'] / prev[name]['median_ms'] - 1) * 100:+.0f}%"
+        print(f"{name:<20}{s['median_ms']:>12.2f}{s['min_ms']:>10.2f}{s['peak_kb']:>12.0f}{delta:>10}")
+    with open(a.out, "w") as f: json.dump(result, f, indent=2)
+    print(f"\nsaved {a.out}")
+    sat = stages["profile_saturated"]
+    if sat["cpu_ms"] > 0.1 * sat["median_ms"]:
+        sys.exit(f"profile_saturated: scheduler used {sat['cpu_ms']:.0f} ms CPU over {sat['median_ms']:.0f} ms (busy-waiting)")
+
+if __name__ == "__main__":
+    main()
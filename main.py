@@ -1,29 +1,70 @@
 #!/usr/bin/env python3
-import subprocess, os, sys, argparse, tempfile
-from modules import config, scanner, engine
+import subprocess, os, sys, time, json, shlex, argparse, tempfile, itertools
+from concurrent.futures import ThreadPoolExecutor
+from modules import config, scanner, engine, daemon, frecency, journal, trace, icons, query, launcher, fulltext, scheduler
 from modules.constants import (
     LABELS, NAV_ICONS, PROMPT_ICONS, SEP_LINE, RUN_ICON, 
-     INTERNAL_MENU, CLI_ONLY, SEARCH_PROVIDERS, 
+     INTERNAL_MENU, SEARCH_PROVIDERS, 
     get_help_text, get_internal_help
 )
 
 def main():
     # 1. Setup & Data Loading
     c = config.get_colors()
-    parser = argparse.ArgumentParser(usage=argparse.SUPPRESS)
-    parser.add_argument('mode', nargs='?', choices=['apps', 'run', 'config', 'options'])
+    # Global flags are accepted before or after the mode
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--daemon', action='store_true', default=argparse.SUPPRESS)
+    common.add_argument('--trace', action='store_true', default=argparse.SUPPRESS)
+    common.add_argument('--rofi-script', action='store_true', default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    # The actions are shared with every subparser: leave their SUPPRESS default alone
+    # (set_defaults would make a subparser reset a flag given before the mode)
+    parser = argparse.ArgumentParser(usage=argparse.SUPPRESS, parents=[common])
+    modes = parser.add_subparsers(dest='mode', prog='cmd-center')
+    for m in ['apps', 'run', 'config', 'options', 'stats']:
+        modes.add_parser(m, parents=[common])
+    q = modes.add_parser('query', parents=[common])
+    q.add_argument('text', nargs='+')
+    q.add_argument('--mode', dest='query_mode', choices=query.MODES, default='all')
+    q.add_argument('--limit', type=int, default=10)
     
     if len(sys.argv) > 1 and sys.argv[1] in ["-h", "--help"]:
         print(get_help_text(c))
         sys.exit(0)
 
+    # Script-mode step: rofi appends the picked row as the last argument
+    script_choice = None
+    if "--rofi-script" in sys.argv and os.environ.get("ROFI_RETV", "0") != "0":
+        script_choice = sys.argv.pop()
+
     args = parser.parse_args()
-    cfg_data = config.load_json(config.CONFIG_PATH)
-    state = config.load_json(config.STATE_PATH)
+    flag = lambda name: getattr(args, name, False)
+    if flag("trace"): trace.enable()
+    if args.mode == "stats":
+        print(trace.summary(c))
+        sys.exit(0)
+    if args.mode == "query":
+        print(json.dumps(query.search(" ".join(args.text), args.query_mode, args.limit), ensure_ascii=False, indent=2))
+        sys.exit(0)
+    if flag("daemon"):
+        daemon.serve()
+        sys.exit(0)
+
+    warm = daemon.fetch("config", "state", "menu")
+    cfg_data, state, menu_idx = warm["config"], warm["state"], warm["menu"]
     
     settings = cfg_data.get("settings", {})
-    menu_data = cfg_data.get("menu", {})
     weights = state.get("history", {}) if settings.get("remember_history", True) else {}
+    script_mode = flag("rofi_script")
+    stream = settings.get("stream_rofi", False) and not script_mode
+    pool = ThreadPoolExecutor(max_workers=2)
+    icon_src = None
+
+    # One rofi for the whole session: rofi re-runs us in script mode for each step
+    if settings.get("rofi_backend") == "script" and not script_mode:
+        script = f"{shlex.quote(sys.executable)} {shlex.quote(os.path.realpath(__file__))} --rofi-script"
+        if args.mode: script += f" {args.mode}"
+        if flag("trace"): script += " --trace"
+        sys.exit(subprocess.run(engine.build_rofi_script_args(settings, script)).returncode)
 
     # 2. Path Resolution
     current_path = []
@@ -32,145 +73,206 @@ def main():
         current_path = [mapping[args.mode]]
     elif settings.get("remember_last_path", True):
         current_path = state.get("last_path", [])
+    if script_choice is not None:
+        current_path = json.loads(os.environ.get("ROFI_DATA") or "{}").get("path", current_path)
+
+    # Config Editor paths are flat; a second element is a content search, which isn't restored
+    persisted = lambda path: path[:1] if path[:1] == [LABELS["config"]] else list(path)
 
     while True:
+        t_step = time.perf_counter()
         path_depth = len(current_path)
-        is_direct_mode = len(sys.argv) > 1 and sys.argv[1] in ["apps", "run", "config", "options"]
+        is_direct_mode = args.mode is not None
         in_run = path_depth > 0 and current_path[0] == LABELS["run"]
         in_apps = path_depth > 0 and current_path[0] == LABELS["apps"]
         in_opts = path_depth > 0 and current_path[0] == LABELS["opts"]
         in_config = path_depth > 0 and current_path[0] == LABELS["config"]
+        in_menu = not (in_opts or in_apps or in_run or in_config)
+        # Config Editor content search: the query rides along as a second path element
+        grep_prefix = settings.get("content_prefix", "?")
+        grep = current_path[1][len(grep_prefix):] if in_config and path_depth > 1 and settings.get("content_index", False) and current_path[1].startswith(grep_prefix) else None
+        # Rows must never contain the prefix, or rofi would select one instead of searching
+        grep_mask = grep_prefix.translate({i: i + 0xFEE0 for i in range(0x21, 0x7F)}) if in_config and settings.get("content_index", False) else None
+
+        show_icons = in_apps or script_mode or settings.get("show_icons_globally", False)
+        rofi_base_cmd = engine.build_rofi_args(settings, enable_icons=show_icons, multi=settings.get("multi_select", False))
+        if show_icons and icon_src is None: icon_src = pool.submit(lambda: daemon.fetch("icons")["icons"])
 
-        show_icons = in_apps or settings.get("show_icons_globally", False)
-        rofi_base_cmd = engine.build_rofi_args(settings, enable_icons=show_icons)
+        def with_icon(label, name):
+            # Hand rofi a resolved file path so it skips its own theme lookup
+            return f"{label}\0icon\x1f{icons.resolve(name, icon_src.result())}" if show_icons else label
 
-        # 3. Resolve Menu Source
+        # 3. Resolve Menu Source (scans may keep running while rofi is already up)
+        loader, source = None, None
         if in_opts: 
             active_menu = INTERNAL_MENU
         elif in_apps: 
-            active_menu = scanner.get_system_apps()
+            loader = lambda: daemon.fetch("apps")["apps"]
         elif in_run:
-            run_hist = {k.split("RUN:")[1]: k.split("RUN:")[1] for k in weights.keys() if k.startswith("RUN:")}
-            active_menu = {**{b: b for b in scanner.get_binaries()}, **run_hist}
+            loader = lambda: {**{b: b for b in daemon.fetch("bins")["bins"]}, **{k: k for k in frecency.items(weights, "RUN")}}
+        elif grep is not None:
+            loader = lambda: fulltext.search(grep, fulltext.load_index(scanner.get_config_files(settings), settings.get("content_max_bytes", fulltext.MAX_BYTES)))
         elif in_config:
-            paths_to_scan = ['~/.config/cmd-center/config.json', *settings.get("editor_paths", [])]
-            config_files = {}
-            for p in paths_to_scan:
-                full_b = os.path.expanduser(p)
-                if not os.path.exists(full_b): continue
-                if os.path.isfile(full_b): 
-                    config_files[full_b] = f"EDT:{full_b}"
-                else:
-                    for r, _, fs in os.walk(full_b):
-                        if any(x in r for x in ['.git', 'node_modules', 'cache']): continue
-                        for f in fs:
-                            fp = os.path.join(r, f)
-                            config_files[fp] = f"EDT:{fp}"
-            active_menu = config_files
-        else: 
-            active_menu = menu_data
-
-        # 4. Navigate Hierarchy
-        try:
-            start_idx = 1 if (in_opts or in_apps or in_run or in_config) else 0
-            for i in range(start_idx, path_depth):
-                node = active_menu[current_path[i]]
-                active_menu = node.get("items", node) if isinstance(node, dict) else node
-        except:
-            current_path, active_menu = [], menu_data
-
-        rofi_list, options_dict = [], {}
+            loader = lambda: scanner.get_config_files(settings)
+        else:
+            # 4. User menu: direct lookup in the compiled index
+            node = engine.menu_node(menu_idx, current_path) if current_path else None
+            if current_path and (node is None or not node["folder"]): current_path, node = [], None
+            active_menu = engine.menu_children(menu_idx, node)
+
+        if loader:
+            source = pool.submit(loader)
+            if not stream: active_menu = source.result()
+        # Built-in modes are flat
+        if not in_menu and path_depth > 1 and grep is None: current_path = current_path[:1]
+        path_depth = len(current_path)
+
+        rofi_list, options_dict, tail = [], {}, ()
         path_str = " > ".join(current_path)
+        score = lambda ns, item: frecency.score(weights, ns, item)
+        nav = lambda label: engine.Entry("NAV", label, label, NAV_ICONS.get(label, ""))
+
+        def ranked_source(ns, make, cached):
+            """
+            Yields the source's entries best-first. When streaming, history hits go
+            out before the scan has finished, built from the last cached index
+            (`cached()`) so they keep their icons and gone items stay hidden;
+            the rest follows once the scan lands.
+            """
+            seen = set()
+            if stream:
+                known = cached()
+                for i in frecency.ranked(weights, ns):
+                    if i not in known: continue
+                    seen.add(i)
+                    yield make(i, known)
+            menu = source.result()
+            yield from engine.rank(make(i, menu) for i in menu if i not in seen)
 
         # 5. Build Rofi List
         if not current_path:
             # A. User Categories
-            cats = sorted(menu_data.keys(), key=lambda x: weights.get(f"HOME:{x}", 0), reverse=True)
-            for cat in cats:
-                val = menu_data[cat]
-                icon = val.get("icon", False) if isinstance(val, dict) else False 
-                label = f"{icon}  {cat}" if icon else f"{cat}"
-                rofi_list.append(f"{label}")
-                options_dict[label] = cat
+            rofi_list.extend(engine.rank(engine.menu_entry(n, "HOME", (score("HOME", k), "")) for k, n in active_menu.items()))
             
             # B. Pinned Modes
-            for m_key in ["run", "apps", "config", "opts"]:
-                label = LABELS[m_key]
-                rofi_list.append(f"{label}")
-                options_dict[label] = label
+            rofi_list.extend(nav(LABELS[m_key]) for m_key in ["run", "apps", "config", "opts"])
+            rofi_list.append(engine.Entry("NAV", SEP_LINE, SEP_LINE))
 
-            rofi_list.append(SEP_LINE)
+            # C. Home Search Pool: menu + run history, plus scanned sources gathered
+            # concurrently; a source that misses the budget is served from its cache
+            hub_sources = settings.get("hub_sources", ["apps", "run", "config"])
+            loaders = {
+                "apps": (lambda: daemon.fetch("apps")["apps"], lambda: scanner.get_system_apps(cached_only=True)),
+                "run": (lambda: daemon.fetch("bins")["bins"], lambda: scanner.get_binaries(cached_only=True)),
+                "config": (lambda: scanner.get_config_files(settings), lambda: scanner.get_config_files(settings, cached_only=True)),
+            }
+            with trace.span("hub.gather", sources=hub_sources):
+                found = scanner.gather({k: v for k, v in loaders.items() if k in hub_sources}, settings.get("hub_budget_ms", 150) / 1000)
 
-            # C. Home Search Pool
-            run_pool = {f"{k.split('RUN:')[1]}    ({LABELS['run']})": k.split('RUN:')[1] for k in weights.keys() if k.startswith("RUN:")}
-            flat_menu = engine.get_flat_menu(menu_data)
-            combined_pool = {**flat_menu, **run_pool}
-            
-            def global_sort(x):
-                clean_name = x.split("\0")[0]
-                if clean_name.endswith(f"({LABELS['apps']})"): return weights.get(f"APPS:{clean_name.split('    (')[0]}", 0)
-                if clean_name.endswith(f"({LABELS['run']})"): return weights.get(f"RUN:{clean_name.split('    (')[0]}", 0)
-                return weights.get(f"HOME:{clean_name}", 0)
-            
-            sorted_pool = sorted(combined_pool.keys(), key=global_sort, reverse=True)
-            rofi_list.extend(sorted_pool)
-            for k in combined_pool.keys(): 
-                options_dict[k.split("\0")[0]] = k.split("\0")[0] 
+            nodes = menu_idx["nodes"]
+            pool_entries = [engine.Entry("HOME", f, f, command=nodes[i]["val"], key=(score("HOME", f), "")) for f, i in menu_idx["by_flat"].items()]
+            pool_entries += [scanner.config_entry(fp, (score("CONFIG", fp), "")) for fp in found.get("config", {})]
+            pool_entries += [scanner.app_entry(n, app, (score("APPS", n), ""), f"{n}    ({LABELS['apps']})") for n, app in found.get("apps", {}).items()]
+            pool_entries += [scanner.bin_entry(b, RUN_ICON, (score("RUN", b), ""), f"{b}    ({LABELS['run']})")
+                             for b in dict.fromkeys([*found.get("run", []), *frecency.items(weights, "RUN")])]
+            rofi_list.extend(engine.rank(pool_entries))
 
             # D. Internal Menu
-            for label in INTERNAL_MENU.keys():
-                rofi_list.append(f"{label}")
-                options_dict[label] = label
+            rofi_list.extend(engine.Entry("HOME", label, label, command=cmd) for label, cmd in INTERNAL_MENU.items())
         else:
             # Sub-menu navigation
-            if (not is_direct_mode) and path_depth >= 1:
-                rofi_list.append(f"{LABELS['back']}")
+            if (not is_direct_mode or grep is not None) and path_depth >= 1:
+                rofi_list.append(nav(LABELS['back']))
 
             if path_depth >= 2:
-                rofi_list.append(f"{LABELS['home']}")
+                rofi_list.append(nav(LABELS['home']))
             
-            items = list(active_menu.keys())
             if in_apps:
-                items.sort(key=lambda x: (weights.get(f"APPS:{x}", 0), x.lower()), reverse=True)
-                
-                for i in items: rofi_list.append(f"{i}\0icon\x1f{active_menu[i].get('icon', '')}")
+                tail = ranked_source("APPS", lambda i, m: scanner.app_entry(i, m[i], (score("APPS", i), i.lower())),
+                                     lambda: scanner.get_system_apps(cached_only=True))
             elif in_run:
-                items.sort(key=lambda x: (weights.get(f"RUN:{x}", 0), x.lower()), reverse=True)
-                for i in items: rofi_list.append(f"🚀  {i}")
+                tail = ranked_source("RUN", lambda i, m: scanner.bin_entry(i, RUN_ICON, (score("RUN", i), i.lower()), f"🚀  {i}"),
+                                     lambda: {*scanner.get_binaries(cached_only=True), *frecency.items(weights, "RUN")})
+            elif grep is not None:
+                tail = engine.rank(fulltext.match_entry(*hit, (score("CONFIG", hit[0]), "")) for hit in source.result())
             elif in_config:
-                home = os.path.expanduser("~")
-                def config_sort(x):
-                    return (weights.get(f"CONFIG:{x}", 0), os.path.basename(x).lower())
-                
-                items.sort(key=config_sort, reverse=True)
-                for fp in items:
-                    fname = os.path.basename(fp)
-                    label = f"📄 {fname}    ({fp.replace(home, '~')})"
-                    w = weights.get(f"CONFIG:{fname}", 0)
-                    icon = "🔥" if w > 5 else "📄"
-                    rofi_list.append(f"{label}")
-                    options_dict[label] = fp
+                tail = ranked_source("CONFIG", lambda fp, m: scanner.config_entry(fp, (score("CONFIG", fp), os.path.basename(fp).lower())),
+                                     lambda: scanner.get_config_files(settings, cached_only=True))
+            elif in_opts:
+                rofi_list.extend(engine.Entry(path_str, label, label, command=cmd) for label, cmd in active_menu.items())
             else:
-                items.sort(key=lambda x: weights.get(f"{path_str}:{x}", 0), reverse=True)
-                for i in items:
-                    v = active_menu[i]
-                    icon = v.get("icon", False) if isinstance(v, dict) else False 
-                    label = f"{icon}  {i}" if icon else f"{i}"
-                    rofi_list.append(f"{label}")
-                    options_dict[label] = i
+                rofi_list.extend(engine.rank(engine.menu_entry(n, path_str, (score(path_str, k), "")) for k, n in active_menu.items()))
+
+        def lines(entries):
+            # Labels register as they are rendered, so streamed rows resolve too
+            for e in entries:
+                if grep_mask and grep_prefix in e.label: e.label = e.label.replace(grep_prefix, grep_mask)
+                options_dict[e.label] = e
+                yield with_icon(e.label, e.icon) if e.icon else e.label
+
+        trace.mark("menu.build", t_step, mode=current_path[0] if current_path else "HUB", depth=path_depth, items=len(rofi_list))
 
         # 6. Interaction
         p_key = "HUB" if not current_path else current_path[0]
         symbol = PROMPT_ICONS.get(p_key, PROMPT_ICONS["DEFAULT"])
         breadcrumb = symbol if not current_path else f"{path_str}"
         
-        proc = subprocess.run([str(x) for x in rofi_base_cmd] + ["-p", breadcrumb], input="\n".join(rofi_list), text=True, capture_output=True)
-        choice = proc.stdout.strip().split("\0")[0]
+        entries = lines(itertools.chain(rofi_list, tail))
+        if script_mode:
+            if script_choice is None:
+                # Re-render inside the running rofi and let it call us back
+                engine.emit_script_menu(entries, breadcrumb, {"path": current_path})
+                sys.exit(0)
+            for _ in entries: pass  # labels register into options_dict as they are built
+            choice, script_choice = script_choice, None
+        else:
+            choice = engine.run_rofi(rofi_base_cmd, entries, breadcrumb, stream=stream)
+        if source: active_menu = source.result()
         if not choice or choice == SEP_LINE:
             if not choice: sys.exit(0)
             continue
 
+        def resolve(e):
+            """(node, value) for a picked entry; user menu entries carry their compiled node,
+            built-in modes look the id up in the loaded source (covers streamed rows)."""
+            if e is None or e.source == "NAV": return None, None
+            if current_path and not in_menu and grep is None: return None, active_menu.get(e.id)
+            if isinstance(e.command, dict) and "folder" in e.command: return e.command, e.command.get("val", e.command)
+            return None, e.command
+
+        def history(e, cmd):
+            if not settings.get("remember_history", True): return []
+            if e is not None: w_ns, w_item = e.source, e.id
+            else: w_ns, w_item = "RUN", cmd[5:] if cmd.startswith('TERM:') else cmd
+            return [journal.hit(w_ns, w_item, settings.get("history_limit", frecency.DEFAULT_LIMIT))]
+
+        def start(sel):
+            # Profiles fan out through the scheduler; anything else is one launch
+            if isinstance(sel, dict) and "profile" in sel:
+                return scheduler.run(sel["profile"], start, sel.get("limit", settings.get("launch_limit", scheduler.DEFAULT_LIMIT)))
+            # argv lists are exec'd directly, no intermediate shell
+            return launcher.launch(launcher.command_for(sel, settings), quiet=script_mode)
+
         # 7. Execution Engine
+        picks = [p for p in choice.split("\n") if p and p != SEP_LINE]
+        if len(picks) > 1:
+            # Multi-select: every runnable pick goes out together, history in one write
+            jobs, records = [], [journal.last_path(persisted(current_path))]
+            for p in picks:
+                # Only listed rows: BACK/HOME (NAV, or unlisted in direct mode) aren't commands
+                e = options_dict.get(p)
+                if e is None or e.source == "NAV": continue
+                node, sel = resolve(e)
+                if sel is None or (node["folder"] if node is not None else engine.is_folder(sel)): continue
+                cmd = str(sel.get("cmd", sel) if isinstance(sel, dict) else sel)
+                if cmd.startswith("INTERNAL:"): continue
+                jobs.append({"name": p, "cmd": sel})
+                records += history(e, cmd)
+            journal.append(*records)
+            if script_mode: engine.release_stdout()
+            scheduler.run(jobs, start, settings.get("launch_limit", scheduler.DEFAULT_LIMIT))
+            sys.exit(0)
+
         if choice.startswith(LABELS["back"]):
             if current_path: current_path.pop()
         elif choice.startswith(LABELS.get("home", "🏠")) and LABELS.get("home") in choice:
@@ -181,22 +283,22 @@ def main():
             # Web Search
             parts = choice.split()
             if len(parts) > 1 and parts[0] in SEARCH_PROVIDERS:
-                subprocess.Popen(f"xdg-open '{SEARCH_PROVIDERS[parts[0]]}{'+'.join(parts[1:])}'", shell=True)
+                # Launched children must not hold rofi's pipe open in script mode
+                launcher.launch(["xdg-open", f"{SEARCH_PROVIDERS[parts[0]]}{'+'.join(parts[1:])}"], quiet=script_mode)
                 sys.exit(0)
 
-            f_key = options_dict.get(choice, choice)
+            e = options_dict.get(choice)
+            if e is None and in_config and settings.get("content_index", False) and choice.startswith(grep_prefix) and choice.rstrip() != grep_prefix:
+                current_path = current_path[:1] + [choice.rstrip()]
+                continue
             
             # Resolve Selection
-            if not current_path:
-                sel = INTERNAL_MENU.get(f_key) or combined_pool.get(f_key) or menu_data.get(f_key)
-            else:
-                sel = active_menu.get(f_key)
-            
+            node, sel = resolve(e)
             if sel is None and in_run: sel = choice.replace("🚀  ", "")
             if sel is None: continue
 
-            if isinstance(sel, dict) and ("items" in sel or "cmd" not in sel):
-                current_path.append(f_key)
+            if node["folder"] if node is not None else engine.is_folder(sel):
+                current_path.append(e.id)
             else:
                 cmd = str(sel.get("cmd", sel) if isinstance(sel, dict) else sel)
                 
@@ -206,37 +308,17 @@ def main():
                         subprocess.run(["yad", "--text-info", f"--filename={t.name}", "--title=Help", "--width=600", "--height=500", "--center", "--fontname=Monospace 11"])
                     continue
                 if cmd == "INTERNAL:CLEAR_HIST":
-                    state["history"] = {}; config.save_json(config.STATE_PATH, state); sys.exit(0)
-
-                # History
-                is_r = "(" + LABELS["run"] in choice or in_run
-                if settings.get("remember_history", True):
-                    if is_r: w_key = f"RUN:{cmd[5:] if cmd.startswith('TERM:') else cmd}"
-                    elif in_apps: w_key = f"APPS:{f_key}"
-                    elif in_config: w_key = f"CONFIG:{f_key}"
-                    else: w_key = f"{path_str if current_path else 'HOME'}:{f_key}"
-                    weights[w_key] = weights.get(w_key, 0) + 1
-                
-                state["last_path"], state["history"] = current_path, weights
-                config.save_json(config.STATE_PATH, state)
-
-                # Launch
-                term = settings.get("terminal_emulator", "wezterm start --")
-                if cmd.startswith("EDT:"):
-                    f_cmd = f"{term} {settings.get('editor', 'nvim')} '{os.path.expanduser(cmd[4:].strip())}'"
-                elif cmd.startswith("WEB:"):
-                    f_cmd = f"xdg-open '{cmd[4:] if '://' in cmd[4:] else 'https://' + cmd[4:]}'"
-                elif (os.path.basename(cmd.split()[0]) if cmd.split() else "") in CLI_ONLY or cmd.startswith("TERM:"):
-                    payload = cmd[5:] if cmd.startswith("TERM:") else cmd
-                    f_cmd = f"{term} bash -c '{payload}; echo; read'"
-                else: 
-                    f_cmd = cmd
-
-                subprocess.Popen(f_cmd, shell=True, start_new_session=True)
+                    journal.append(journal.clear_history()); sys.exit(0)
+
+                journal.append(journal.last_path(persisted(current_path)), *history(e, cmd))
+                # Profiles may sleep on delays: don't keep a script-mode rofi waiting
+                if script_mode and isinstance(sel, dict) and "profile" in sel: engine.release_stdout()
+                start(sel)
                 sys.exit(0)
 
-        state["last_path"] = current_path
-        config.save_json(config.STATE_PATH, state)
+        if state.get("last_path") != persisted(current_path):
+            state["last_path"] = persisted(current_path)
+            journal.append(journal.last_path(persisted(current_path)))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,8 +1,13 @@
-import os, json, sys
+import os, json, sys, tempfile
 
 BASE_DIR = os.path.expanduser("~/.config/cmd-center")
 CONFIG_PATH = os.path.join(BASE_DIR, "config.json")
 STATE_PATH = os.path.join(BASE_DIR, "state.json")
+# Persistent indexes (apps, binaries, ...) live here; honour XDG when set
+CACHE_DIR = os.path.join(os.environ["XDG_CACHE_HOME"], "cmd-center") if os.environ.get("XDG_CACHE_HOME") else os.path.join(BASE_DIR, "cache")
+# CMD_CENTER_DATA_DIRS (os.pathsep-separated share dirs) replaces the system
+# locations apps and icons are read from, e.g. for hermetic benchmarks
+DATA_DIRS = [d for d in os.environ.get("CMD_CENTER_DATA_DIRS", "").split(os.pathsep) if d]
 
 def load_json(path):
     if os.path.exists(path):
@@ -11,12 +16,31 @@ def load_json(path):
         except: return {}
     return {}
 
-def save_json(path, data):
+def save_json(path, data, indent=2):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f: json.dump(data, f, indent=2)
+    # Unique per writer: daemon handlers and scan threads may save the same file at once
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f: json.dump(data, f, indent=indent)
+        os.replace(tmp, path)
+    except BaseException:
+        try: os.unlink(tmp)
+        except OSError: pass
+        raise
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+def load_cache(name):
+    return load_json(cache_path(name))
+
+def save_cache(name, data):
+    # Compact + atomic: caches are rewritten often and read on every launch
+    try: save_json(cache_path(name), data, indent=None)
+    except OSError: pass
 
 def get_colors():
     return {
         "blue": "\033[94m", "green": "\033[92m", 
         "yellow": "\033[93m", "reset": "\033[0m", "bold": "\033[1m"
-    }
\ No newline at end of file
+    }
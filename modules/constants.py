@@ -13,6 +13,7 @@ LABELS = {
 
 # --- ICON MAPPING ---
 # Maps the UI labels to internal system icon names for Rofi's -show-icons mode.
+# Resolved to file paths through modules.icons before they reach Rofi.
 NAV_ICONS = {
     LABELS["back"]: "go-previous",
     LABELS["home"]: "go-home",
@@ -68,7 +69,11 @@ def get_help_text(c):
         f"  {c['green']}apps{c['reset']}      Direct to Applications\n"
         f"  {c['green']}run{c['reset']}       Direct to Binary Runner\n"
         f"  {c['green']}config{c['reset']}    Direct to Config Editor\n"
-        f"  {c['green']}options{c['reset']}   Direct to Settings"
+        f"  {c['green']}options{c['reset']}   Direct to Settings\n\n"
+        f"  {c['green']}stats{c['reset']}     Per-stage p50/p95 from the trace log\n"
+        f"  {c['green']}query{c['reset']}     query <text> [--mode all|menu|apps|run|config] [--limit K] -> ranked JSON\n\n"
+        f"  {c['green']}--daemon{c['reset']}  Keep menus warm in memory; later calls become thin clients\n"
+        f"  {c['green']}--trace{c['reset']}   Log per-stage timings (also CMD_CENTER_TRACE=1)"
     )
 
 def get_internal_help():
@@ -82,6 +87,7 @@ def get_internal_help():
         f"   {LABELS['apps'].ljust(20)} -> Browse system desktop files",
         f"   {LABELS['run'].ljust(20)} -> Execute binaries with history",
         f"   {LABELS['config'].ljust(20)} -> Edit defined config files",
+        "   ?text in Config Editor  -> file:line matches (content_index)",
         "",
         " ■ WEB SEARCHES",
         "   Type the prefix followed by your query:",
@@ -98,6 +104,10 @@ def get_internal_help():
     lines.append("   WEB:   Forces string to open as a URL in Browser")
     lines.append("   EDT:   Opens file in terminal editor (Config Mode)")
     lines.append("")
+    lines.append(" ■ MULTI-LAUNCH")
+    lines.append("   Shift+Enter marks rows, Enter launches them all (multi_select)")
+    lines.append("   Menu nodes with a \"profile\" list start several commands at once")
+    lines.append("")
     lines.append(" ■ AUTO-TERMINAL APPLICATIONS")
     lines.append("   The following run in terminal automatically:")
     lines.append("   --------------------------------------------------------")
@@ -0,0 +1,134 @@
+import os, sys, json, signal, socket, struct, threading, time
+from modules import config, scanner, engine, journal, trace, icons
+
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", f"cmd-center-{os.getuid()}.sock")
+POLL_INTERVAL = 2.0
+
+def _mtimes(paths):
+    sig = []
+    for p in paths:
+        try: sig.append(os.stat(p).st_mtime)
+        except OSError: sig.append(None)
+    return sig
+
+def _path_dirs():
+    return list(dict.fromkeys(os.environ.get("PATH", "").split(os.pathsep)))
+
+# name -> (watched paths, loader). The bins cache file is watched too so a
+# background re-scan from get_binaries gets picked up on the next poll.
+SOURCES = {
+    "config": (lambda: [config.CONFIG_PATH], lambda: config.load_json(config.CONFIG_PATH)),
+    "state": (lambda: [config.STATE_PATH, journal.JOURNAL_PATH], journal.load),
+    "menu": (lambda: [config.CONFIG_PATH], engine.load_menu_index),
+    "apps": (lambda: scanner.APP_DIRS, scanner.get_system_apps),
+    "icons": (lambda: [config.CONFIG_PATH, config.cache_path("icons"), *icons.ICON_BASES],
+              lambda: icons.load_index(config.load_json(config.CONFIG_PATH).get("settings", {}))),
+    "bins": (lambda: _path_dirs() + [config.cache_path("bins")], scanner.get_binaries),
+}
+
+def load_local(*names):
+    return {n: SOURCES[n][1]() for n in names}
+
+def _owned(path):
+    # Without XDG_RUNTIME_DIR the socket sits in shared /tmp, where anyone could plant it
+    try: return os.lstat(path).st_uid == os.getuid()
+    except OSError: return False
+
+def _peer_is_us(s):
+    """The process behind the socket runs as us (SO_PEERCRED; owner check only elsewhere)."""
+    if not hasattr(socket, "SO_PEERCRED"): return True
+    _, uid, _ = struct.unpack("3i", s.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+    return uid == os.getuid()
+
+@trace.timed("daemon.fetch")
+def fetch(*names):
+    """
+    Returns {name: data} for the requested sources, asking the resident
+    daemon when one is running and falling back to loading in-process.
+    """
+    if _owned(SOCKET_PATH):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(2)
+                s.connect(SOCKET_PATH)
+                if not _peer_is_us(s): raise ConnectionRefusedError(f"{SOCKET_PATH} is served by another user")
+                s.sendall(json.dumps({"get": names}).encode() + b"\n")
+                s.shutdown(socket.SHUT_WR)
+                buf = b"".join(iter(lambda: s.recv(65536), b""))
+            data = json.loads(buf)
+            if all(n in data for n in names):
+                trace.note(via="daemon", sources=list(names))
+                return data
+        except (OSError, ValueError):
+            pass
+    trace.note(via="local", sources=list(names))
+    return load_local(*names)
+
+class _Warm:
+    """In-memory copies of every source, reloaded when their watched paths change."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data, self.sigs = {}, {}
+
+    def refresh(self):
+        for name, (paths, loader) in SOURCES.items():
+            sig = _mtimes(paths())
+            if self.sigs.get(name) == sig: continue
+            value = loader()
+            with self.lock:
+                self.data[name], self.sigs[name] = value, sig
+
+    def get(self, names):
+        with self.lock:
+            return {n: self.data[n] for n in names if n in self.data}
+
+def _watch(warm):
+    while True:
+        time.sleep(POLL_INTERVAL)
+        try: warm.refresh()
+        except Exception: pass
+        trace.flush()
+
+def _handle(conn, warm):
+    with conn:
+        try:
+            req = json.loads(b"".join(iter(lambda: conn.recv(65536), b"")) or b"{}")
+            names = [n for n in req.get("get", []) if n in SOURCES]
+            warm.refresh()
+            conn.sendall(json.dumps(warm.get(names)).encode())
+        except (OSError, ValueError):
+            pass
+    # The daemon never exits normally: write this request's records now
+    trace.flush()
+
+def serve():
+    """Runs the resident daemon on SOCKET_PATH until killed."""
+    if os.path.lexists(SOCKET_PATH):
+        if not _owned(SOCKET_PATH): raise SystemExit(f"{SOCKET_PATH} belongs to another user; set XDG_RUNTIME_DIR")
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.connect(SOCKET_PATH)
+            raise SystemExit(f"cmd-center daemon already running on {SOCKET_PATH}")
+        except ConnectionRefusedError:
+            os.unlink(SOCKET_PATH)
+
+    warm = _Warm()
+    warm.refresh()
+    threading.Thread(target=_watch, args=(warm,), daemon=True).start()
+
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try: srv.bind(SOCKET_PATH)
+    finally: os.umask(old_umask)
+    srv.listen(16)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            conn, _ = srv.accept()
+            threading.Thread(target=_handle, args=(conn, warm), daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.close()
+        try: os.unlink(SOCKET_PATH)
+        except OSError: pass
@@ -1,7 +1,12 @@
-def build_rofi_args(settings, enable_icons=False):
+import os, sys, json, subprocess
+from operator import attrgetter
+from modules import config, trace
+
+def build_rofi_args(settings, enable_icons=False, multi=False):
     """
     Constructs the Rofi command. Icons are enabled only if 
     enable_icons is True or the global setting is True.
+    multi adds -multi-select (dmenu only; picks come back one per line).
     """
     loc_val = {"top": 2, "bottom": 7, "left": 4, "right": 5, "center": 0}.get(settings.get("location", "center"), 0)
     width, lines = settings.get("width", 30), settings.get("height", 12)
@@ -16,9 +21,33 @@ def build_rofi_args(settings, enable_icons=False):
     # Toggle icons based on the passed state
     if enable_icons or settings.get("show_icons_globally", False):
         cmd.append("-show-icons")
+    if multi: cmd.append("-multi-select")
         
     return cmd
 
+def build_rofi_script_args(settings, script_cmd):
+    """
+    Rofi command for the single-session backend: same look as dmenu mode, but
+    rofi drives `script_cmd` through its script-mode (-modi) protocol.
+    """
+    cmd = build_rofi_args(settings, enable_icons=True)
+    cmd[cmd.index("-dmenu")] = "-show"
+    return cmd[:2] + ["cmd-center", "-modi", f"cmd-center:{script_cmd}"] + cmd[2:]
+
+def emit_script_menu(entries, prompt, data):
+    """Writes one rofi script-mode page (mode options + rows) and releases stdout."""
+    out = sys.stdout
+    out.write(f"\0prompt\x1f{prompt}\n\0data\x1f{json.dumps(data, ensure_ascii=False)}\n")
+    for e in entries: out.write(f"{e}\n")
+    release_stdout()
+
+def release_stdout():
+    """Points fd 1 at /dev/null so rofi sees EOF without waiting for our exit."""
+    sys.stdout.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
 def get_flat_menu(menu, prefix="", in_apps=False):
     """
     Recursively flattens the menu for Global Search.
@@ -31,10 +60,7 @@ def get_flat_menu(menu, prefix="", in_apps=False):
         label = val.get("label", key) if isinstance(val, dict) else key
         
         # 2. Identify if this is a Category (Folder)
-        # It's a folder if it has an 'items' key OR if it's a dict WITHOUT a 'cmd' key
-        is_folder = isinstance(val, dict) and ("items" in val or "cmd" not in val)
-        
-        if is_folder:
+        if is_folder(val):
             # Dive deeper into the folder
             # If the folder uses the new structure, we pass 'items', else pass the dict itself
             sub_menu = val.get("items", val)
@@ -51,4 +77,124 @@ def get_flat_menu(menu, prefix="", in_apps=False):
             
             flat[rofi_entry] = val
             
-    return flat
\ No newline at end of file
+    return flat
+
+def is_folder(val):
+    # It's a folder if it has an 'items' key OR if it's a dict WITHOUT a 'cmd' / 'profile' key
+    return isinstance(val, dict) and ("items" in val or ("cmd" not in val and "profile" not in val))
+
+def compile_menu(menu):
+    """
+    Compiles the user menu into a flat node table so navigation, breadcrumbs
+    and global search are dict lookups instead of recursive walks.
+
+    Node: {"key", "parent", "label", "folder"} plus "children" ({key: id})
+    for folders, or "val" (the raw config value) and "flat" (search label)
+    for leaves.
+    """
+    nodes, by_flat = [], {}
+
+    def walk(sub, parent, prefix):
+        ids = {}
+        for key, val in sub.items():
+            icon = val.get("icon", False) if isinstance(val, dict) else False
+            node = {"key": key, "parent": parent, "label": f"{icon}  {key}" if icon else f"{key}", "folder": is_folder(val)}
+            nid = ids[key] = len(nodes)
+            nodes.append(node)
+            title = val.get("label", key) if isinstance(val, dict) else key
+            if node["folder"]:
+                node["children"] = walk(val.get("items", val), nid, f"{prefix} > {title}" if prefix else title)
+            else:
+                node["val"] = val
+                node["flat"] = f"{title}    ({prefix})" if prefix else title
+                by_flat[node["flat"]] = nid
+        return ids
+
+    roots = walk(menu, None, "")
+    return {"nodes": nodes, "roots": roots, "by_flat": by_flat}
+
+_menu_memo = {}
+
+@trace.timed("engine.menu_index")
+def load_menu_index():
+    """
+    The compiled menu for config.json, kept in memory and keyed by the config's
+    mtime. Not persisted: the table is several times larger than config.json,
+    so loading it back is slower than recompiling (the daemon keeps it warm).
+    """
+    try: st = os.stat(config.CONFIG_PATH); sig = [st.st_mtime, st.st_size]
+    except OSError: sig = None
+    index = _menu_memo.get("index")
+    if sig is not None and index is not None and index["sig"] == sig:
+        trace.note(cache="hit", items=len(index["nodes"]))
+        return index
+    index = compile_menu(config.load_json(config.CONFIG_PATH).get("menu", {}))
+    index["sig"] = sig
+    _menu_memo["index"] = index
+    trace.note(cache="miss", items=len(index["nodes"]))
+    return index
+
+def menu_node(index, path):
+    """Node at `path` (a list of keys), one dict hop per level; None if it no longer exists."""
+    node, ids = None, index["roots"]
+    for key in path:
+        nid = ids.get(key)
+        if nid is None: return None
+        node = index["nodes"][nid]
+        ids = node.get("children", {})
+    return node
+
+def menu_children(index, node=None):
+    """{key: node} for a folder node, or the top level when node is None."""
+    ids = index["roots"] if node is None else node["children"]
+    return {k: index["nodes"][i] for k, i in ids.items()}
+
+# --- ENTRIES ---
+class Entry:
+    """
+    One selectable row. source/id double as the history namespace and item,
+    command is the payload (a compiled node for menu entries) and key is the
+    precomputed sort key, so ranking never has to look at the label.
+    """
+    __slots__ = ("source", "id", "label", "icon", "command", "key")
+
+    def __init__(self, source, id, label, icon="", command=None, key=(0.0, "")):
+        self.source, self.id, self.label, self.icon = source, id, label, icon
+        self.command = id if command is None else command
+        self.key = key
+
+def menu_entry(node, source, key=(0.0, ""), label=None):
+    return Entry(source, node["key"], label or node["label"], command=node, key=key)
+
+def rank(entries):
+    """Best-first in one keyed sort; ties keep their input order."""
+    return sorted(entries, key=attrgetter("key"), reverse=True)
+
+@trace.timed("rofi")
+def run_rofi(cmd, entries, prompt, stream=False):
+    """
+    Shows `entries` in rofi and returns the picked line (without metadata).
+    With stream=True rofi starts first and entries are piped in as the
+    generator produces them, so slow sources don't delay the window.
+    """
+    cmd = [str(x) for x in cmd] + ["-p", prompt]
+    if not stream:
+        entries = list(entries)
+        trace.note(items=len(entries))
+        proc = subprocess.run(cmd, input="\n".join(entries), text=True, capture_output=True)
+        return proc.stdout.strip().split("\0")[0]
+
+    proc = subprocess.Popen(cmd + ["-async-pre-read", "10"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    n = -1
+    try:
+        for n, e in enumerate(entries):
+            proc.stdin.write(f"{e}\n")
+            # Push the head (history, nav) out right away, then let the pipe batch
+            if n < 256 or n % 256 == 0: proc.stdin.flush()
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass  # user picked something before we finished
+    trace.note(items=n + 1, streamed=True)
+    out = proc.stdout.read()
+    proc.wait()
+    return out.strip().split("\0")[0]
@@ -0,0 +1,58 @@
+import time, heapq
+
+# Scores halve every HALF_LIFE seconds, so stale favourites fade out
+HALF_LIFE = 14 * 86400
+DEFAULT_LIMIT = 5000
+
+def migrate(hist):
+    """
+    Upgrades the legacy flat {"NS:item": count} history to the namespaced
+    {ns: {item: [score, last_used]}} layout. Already migrated data passes through.
+    """
+    if not any(not isinstance(v, dict) for v in hist.values()): return hist
+    now, out = time.time(), {}
+    for key, val in hist.items():
+        if isinstance(val, dict):
+            out.setdefault(key, {}).update(val)
+            continue
+        ns, sep, item = key.partition(":")
+        if not sep or not isinstance(val, (int, float)): continue
+        out.setdefault(ns, {})[item] = [float(val), now]
+    return out
+
+def _decay(rec, now):
+    return rec[0] * 0.5 ** (max(now - rec[1], 0) / HALF_LIFE)
+
+def score(hist, ns, item, now=None):
+    rec = hist.get(ns, {}).get(item)
+    return _decay(rec, now or time.time()) if rec else 0
+
+def items(hist, ns):
+    """The namespace's {item: [score, last_used]} index (no prefix filtering)."""
+    return hist.get(ns, {})
+
+def ranked(hist, ns, now=None):
+    now = now or time.time()
+    bucket = hist.get(ns, {})
+    return sorted(bucket, key=lambda i: _decay(bucket[i], now), reverse=True)
+
+def bump(hist, ns, item, now=None, limit=DEFAULT_LIMIT):
+    now = now or time.time()
+    bucket = hist.setdefault(ns, {})
+    rec = bucket.get(item)
+    bucket[item] = [(_decay(rec, now) if rec else 0) + 1, now]
+    prune(hist, limit, now)
+    return hist
+
+def prune(hist, limit=DEFAULT_LIMIT, now=None):
+    """Evicts the lowest scored entries once the store exceeds `limit`."""
+    total = sum(len(b) for b in hist.values())
+    if total <= limit: return hist
+    now = now or time.time()
+    # Trim to 90% so we don't evict on every single bump at the cap
+    drop = total - int(limit * 0.9)
+    recs = ((_decay(r, now), ns, i) for ns, b in hist.items() for i, r in b.items())
+    for _, ns, item in heapq.nsmallest(drop, recs):
+        del hist[ns][item]
+        if not hist[ns]: del hist[ns]
+    return hist
@@ -0,0 +1,104 @@
+import os
+from modules import config, trace, engine
+
+# Trigram index over Config Editor file contents, kept in the "fulltext" cache.
+# A file is only re-read when its mtime or size changes; binary and oversized
+# files are remembered (so they aren't re-checked) but never indexed.
+INDEX_VERSION = 1
+MAX_BYTES = 512 * 1024
+
+def _grams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _read(fp, max_bytes):
+    with open(fp, 'rb') as f: data = f.read(max_bytes + 1)
+    if len(data) > max_bytes or b"\0" in data[:4096]: return None
+    return data.decode("utf-8", errors="replace").lower()
+
+def _compact(index):
+    """Renumbers file ids once removed files leave too many holes."""
+    remap = {}
+    for i, fp in enumerate(index["paths"]):
+        if fp is not None: remap[i] = len(remap)
+    index["paths"] = [fp for fp in index["paths"] if fp is not None]
+    index["sigs"] = [s for s in index["sigs"] if s is not None]
+    index["tri"] = {g: [remap[i] for i in ids] for g, ids in index["tri"].items()}
+
+@trace.timed("fulltext.index")
+def load_index(files, max_bytes=MAX_BYTES):
+    """
+    The content index for `files` (paths), brought up to date: files whose
+    [mtime, size] moved are dropped from the postings and re-read, new ones
+    appended. Returns {"paths", "sigs", "tri": {trigram: [file id]}, "skipped"}.
+    """
+    index = config.load_cache("fulltext")
+    if index.get("v") != INDEX_VERSION: index = {"v": INDEX_VERSION, "paths": [], "sigs": [], "tri": {}, "skipped": {}}
+    paths, sigs, skipped = index["paths"], index["sigs"], index["skipped"]
+
+    now = {}
+    for fp in files:
+        try: st = os.stat(fp)
+        except OSError: continue
+        now[fp] = [st.st_mtime, st.st_size]
+
+    ids = {fp: i for i, fp in enumerate(paths) if fp is not None}
+    stale = {i for fp, i in ids.items() if now.get(fp) != sigs[i]}
+    for i in stale: paths[i] = sigs[i] = None
+    if stale:
+        index["tri"] = {g: kept for g, kept in ((g, [i for i in l if i not in stale]) for g, l in index["tri"].items()) if kept}
+    dirty = bool(stale)
+    for fp in [fp for fp in skipped if now.get(fp) != skipped[fp]]:
+        del skipped[fp]
+        dirty = True
+
+    tri, fresh = index["tri"], [fp for fp in now if (fp not in ids or ids[fp] in stale) and fp not in skipped]
+    for fp in fresh:
+        try: text = _read(fp, max_bytes)
+        except OSError: continue
+        dirty = True
+        if text is None:
+            skipped[fp] = now[fp]
+            continue
+        i = len(paths)
+        paths.append(fp)
+        sigs.append(now[fp])
+        for g in _grams(text): tri.setdefault(g, []).append(i)
+
+    holes = paths.count(None)
+    trace.note(files=len(paths) - holes, reread=len(fresh), grams=len(index["tri"]))
+    if holes > 64 and holes > len(paths) // 2: _compact(index)
+    if dirty: config.save_cache("fulltext", index)
+    return index
+
+@trace.timed("fulltext.search")
+def search(text, index, limit=200):
+    """(path, line number, line) for lines containing `text`, case-insensitively."""
+    q = text.lower()
+    if not q: return []
+    paths, tri = index["paths"], index["tri"]
+    if len(q) >= 3:
+        # Files must contain every query trigram; intersect rarest first
+        cands = None
+        for g in sorted(_grams(q), key=lambda g: len(tri.get(g, ()))):
+            cands = set(tri.get(g, ())) if cands is None else cands.intersection(tri.get(g, ()))
+            if not cands: return []
+    else:
+        cands = range(len(paths))
+
+    hits = []
+    for i in sorted(cands):
+        if paths[i] is None: continue
+        try:
+            with open(paths[i], errors="replace") as f:
+                for n, line in enumerate(f, 1):
+                    if q not in line.lower(): continue
+                    hits.append((paths[i], n, line.strip()))
+                    if len(hits) >= limit: return hits
+        except OSError:
+            continue
+    trace.note(candidates=len(cands), hits=len(hits))
+    return hits
+
+def match_entry(fp, line, text, key=(0.0, ""), home=os.path.expanduser("~")):
+    """A `file:line` row that opens the editor at that line."""
+    return engine.Entry("CONFIG", fp, f"{fp.replace(home, '~')}:{line}: {text[:160]}", command=f"EDT:+{line} {fp}", key=key)
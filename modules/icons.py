@@ -0,0 +1,107 @@
+import os, re, configparser
+from modules import config, trace
+
+# Searched in priority order, per the XDG icon theme spec
+ICON_BASES = [os.path.join(d, "icons") for d in config.DATA_DIRS] or [
+    os.path.expanduser("~/.local/share/icons"),
+    os.path.expanduser("~/.icons"),
+    os.path.expanduser("~/.local/share/flatpak/exports/share/icons"),
+    "/var/lib/flatpak/exports/share/icons",
+    "/usr/local/share/icons",
+    "/usr/share/icons",
+]
+PIXMAPS = os.path.join(config.DATA_DIRS[-1], "pixmaps") if config.DATA_DIRS else "/usr/share/pixmaps"
+EXTS = (".png", ".svg", ".xpm")
+SCALABLE = 10000
+INDEX_VERSION = 2
+_SIZE_RE = re.compile(r"(\d+)(?:x\d+)?(?:@\d+)?$")
+
+def active_theme(settings):
+    """`icon_theme` setting, else GTK's configured theme, else hicolor."""
+    if settings.get("icon_theme"): return settings["icon_theme"]
+    ini = configparser.ConfigParser(interpolation=None)
+    try:
+        ini.read(os.path.expanduser("~/.config/gtk-3.0/settings.ini"))
+        return ini.get("Settings", "gtk-icon-theme-name", fallback="hicolor")
+    except configparser.Error:
+        return "hicolor"
+
+def _theme_chain(theme):
+    """The theme plus everything it Inherits=, ending in hicolor."""
+    chain, todo = [], [theme]
+    while todo:
+        t = todo.pop(0)
+        if t in chain: continue
+        chain.append(t)
+        for base in ICON_BASES:
+            ini = configparser.ConfigParser(interpolation=None, strict=False)
+            try: ini.read(os.path.join(base, t, "index.theme"))
+            except configparser.Error: continue
+            todo += [x.strip() for x in ini.get("Icon Theme", "Inherits", fallback="").split(",") if x.strip()]
+    if "hicolor" not in chain: chain.append("hicolor")
+    return chain
+
+def _dir_size(rel):
+    """Nominal size for a theme subdir like 48x48/apps, apps/48 or scalable/apps."""
+    for part in rel.split(os.sep):
+        if part == "scalable": return SCALABLE
+        m = _SIZE_RE.match(part)
+        if m: return int(m.group(1))
+    return 0
+
+def _build(chain, size):
+    best, dirs = {}, []
+    for rank, theme in enumerate(chain):
+        for base in ICON_BASES:
+            root = os.path.join(base, theme)
+            if not os.path.isdir(root): continue
+            for cur, subdirs, files in os.walk(root):
+                dirs.append(cur)
+                sz = _dir_size(os.path.relpath(cur, root))
+                # Prefer exact size, then larger (downscales cleanly), then scalable, then smaller
+                if sz == SCALABLE: dist = (1, 0)
+                elif sz >= size: dist = (0, sz - size)
+                else: dist = (2, size - sz)
+                for f in files:
+                    stem, ext = os.path.splitext(f)
+                    if ext not in EXTS: continue
+                    cand = (rank, dist)
+                    if stem not in best or cand < best[stem][0]:
+                        best[stem] = (cand, os.path.join(cur, f))
+    if os.path.isdir(PIXMAPS):
+        dirs.append(PIXMAPS)
+        for f in os.listdir(PIXMAPS):
+            stem, ext = os.path.splitext(f)
+            if ext in EXTS and stem not in best: best[stem] = (None, os.path.join(PIXMAPS, f))
+    return {k: v[1] for k, v in best.items()}, dirs
+
+def _mtimes(dirs):
+    sig = []
+    for d in dirs:
+        try: sig.append(os.stat(d).st_mtime)
+        except OSError: sig.append(None)
+    return sig
+
+@trace.timed("icons.index")
+def load_index(settings):
+    """
+    {icon name: absolute path} for the active theme and `icon_size`, cached on
+    disk and rebuilt when any indexed icon directory's mtime moves.
+    """
+    key = [active_theme(settings), settings.get("icon_size", 48), INDEX_VERSION]
+    cached = config.load_cache("icons")
+    if cached.get("key") == key and cached.get("sig") == _mtimes(cached.get("dirs", [])) + _mtimes(ICON_BASES):
+        trace.note(cache="hit", items=len(cached.get("map", {})))
+        return cached["map"]
+
+    icon_map, dirs = _build(_theme_chain(key[0]), key[1])
+    config.save_cache("icons", {"key": key, "dirs": dirs, "sig": _mtimes(dirs) + _mtimes(ICON_BASES), "map": icon_map})
+    trace.note(cache="miss", items=len(icon_map))
+    return icon_map
+
+def resolve(name, icon_map):
+    """Absolute path for an Icon= value; unknown names are passed through for rofi to try."""
+    if not name or os.path.isabs(name): return name
+    stem, ext = os.path.splitext(name)
+    # Only a real file extension may be dropped: "org.gnome.Nautilus" is a full name
+    return icon_map.get(name) or (ext in EXTS and icon_map.get(stem)) or name
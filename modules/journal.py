@@ -0,0 +1,122 @@
+import os, json, time, fcntl
+from contextlib import contextmanager
+from modules import config, frecency, trace
+
+# state.json is a snapshot; changes since the last compaction are appended
+# here as one JSON record per line and replayed on load. The journal opens
+# with a "gen" record naming the snapshot generation it applies to, so a
+# journal that was already folded in (crash mid-compaction) is not replayed.
+JOURNAL_PATH = config.STATE_PATH + ".journal"
+LOCK_PATH = config.STATE_PATH + ".lock"
+COMPACT_BYTES = 64 * 1024
+
+@contextmanager
+def _locked(mode):
+    os.makedirs(config.BASE_DIR, exist_ok=True)
+    fd = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, mode)
+        yield fd
+    finally:
+        os.close(fd)
+
+# --- RECORDS ---
+def hit(ns, item, limit=frecency.DEFAULT_LIMIT):
+    return {"op": "hit", "ns": ns, "item": item, "t": time.time(), "limit": limit}
+
+def last_path(path):
+    return {"op": "path", "v": list(path)}
+
+def clear_history():
+    return {"op": "clear"}
+
+def _generation(gen):
+    return {"op": "gen", "v": gen}
+
+def _leading_gen():
+    """The journal's opening gen record value; None if empty/missing or it has no header."""
+    try:
+        with open(JOURNAL_PATH, 'r') as f: rec = json.loads(f.readline() or "null")
+    except (OSError, ValueError):
+        return None
+    return rec.get("v") if isinstance(rec, dict) and rec.get("op") == "gen" else None
+
+def _snapshot_gen(lock_fd):
+    """
+    state.json's gen without parsing it: the lock file caches it against the
+    snapshot's inode/mtime/size (save_json renames, so every write changes
+    them). Call under the EX lock.
+    """
+    try: st = os.stat(config.STATE_PATH); sig = [st.st_ino, st.st_mtime_ns, st.st_size]
+    except OSError: return 0
+    try: cached = json.loads(os.pread(lock_fd, 4096, 0) or b"null")
+    except ValueError: cached = None
+    if isinstance(cached, dict) and cached.get("sig") == sig: return cached.get("gen", 0)
+    gen = config.load_json(config.STATE_PATH).get("gen", 0)
+    os.ftruncate(lock_fd, 0)
+    os.pwrite(lock_fd, json.dumps({"sig": sig, "gen": gen}).encode(), 0)
+    return gen
+
+def _apply(state, rec):
+    op = rec.get("op")
+    if op == "hit":
+        frecency.bump(state.setdefault("history", {}), rec["ns"], rec["item"], now=rec["t"], limit=rec.get("limit", frecency.DEFAULT_LIMIT))
+    elif op == "path":
+        state["last_path"] = rec["v"]
+    elif op == "clear":
+        state["history"] = {}
+
+def _replay():
+    state = config.load_json(config.STATE_PATH)
+    state["history"] = frecency.migrate(state.get("history", {}))
+    try:
+        with open(JOURNAL_PATH, 'r') as f:
+            for line in f:
+                try: rec = json.loads(line)
+                except ValueError: continue  # torn/corrupt line
+                if isinstance(rec, dict) and rec.get("op") == "gen":
+                    if rec.get("v") != state.get("gen", 0): break  # already in the snapshot
+                    continue
+                try: _apply(state, rec)
+                except (KeyError, TypeError, AttributeError): continue
+    except OSError:
+        pass
+    return state
+
+@trace.timed("journal.load")
+def load():
+    """Snapshot + journal replay, i.e. the current state."""
+    with _locked(fcntl.LOCK_SH):
+        return _replay()
+
+def _compact():
+    # Snapshot first, then reset the journal; if we die in between, the old
+    # journal's gen no longer matches and load() skips it
+    state = _replay()
+    state["gen"] = state.get("gen", 0) + 1
+    config.save_json(config.STATE_PATH, state, indent=None)
+    with open(JOURNAL_PATH, 'w') as f: f.write(json.dumps(_generation(state["gen"])) + "\n")
+
+def append(*records):
+    """Appends records in one write; compacts into state.json once the journal grows large."""
+    if not records: return
+    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode()
+    with _locked(fcntl.LOCK_EX) as lock_fd:
+        gen = _snapshot_gen(lock_fd)
+        head = _leading_gen()
+        # A journal left behind by a compaction that died after the snapshot is
+        # already folded in: start over, or new records would land after its stale gen
+        stale = head is not None and head != gen
+        fd = os.open(JOURNAL_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT | (os.O_TRUNC if stale else 0), 0o600)
+        try:
+            if os.fstat(fd).st_size == 0:
+                data = (json.dumps(_generation(gen)) + "\n").encode() + data
+            os.write(fd, data)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > COMPACT_BYTES: _compact()
+
+def compact():
+    with _locked(fcntl.LOCK_EX):
+        _compact()
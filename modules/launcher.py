@@ -0,0 +1,74 @@
+import os, re, shlex, subprocess
+from modules import trace
+from modules.constants import CLI_ONLY
+
+# Anything here means the command really needs /bin/sh to interpret it
+SHELL_CHARS = re.compile(r"[|&;<>()$`*?\[\]#~{}!\n\\]|^\s*\w+=")
+FIELD_CODE = re.compile(r"%(.)")
+
+def parse_exec(line, name="", icon="", path=""):
+    """
+    argv for a desktop-entry Exec= value with field codes expanded: file/URL
+    codes are dropped (we never pass files), %i/%c/%k filled in, %% kept.
+    Returns None when the line can't be tokenised.
+    """
+    try: tokens = shlex.split(line)
+    except ValueError: return None
+    # One left-to-right pass, so "%%u" is a literal "%u" and not an escaped %u
+    expand = lambda m: {"%": "%", "c": name, "k": path}.get(m.group(1), "")
+    argv = []
+    for tok in tokens:
+        if tok in ("%f", "%F", "%u", "%U", "%d", "%D", "%n", "%N", "%v", "%m"): continue
+        if tok == "%i":
+            if icon: argv += ["--icon", icon]
+            continue
+        argv.append(FIELD_CODE.sub(expand, tok))
+    return argv or None
+
+def needs_shell(cmd):
+    return bool(SHELL_CHARS.search(cmd))
+
+def command_for(sel, settings):
+    """
+    What to launch for a picked value (command string, or app/leaf dict):
+    an argv list where prefixes and CLI_ONLY programs can be expanded
+    without a shell, else the plain string.
+    """
+    cmd = str(sel.get("cmd", sel) if isinstance(sel, dict) else sel)
+    term = shlex.split(settings.get("terminal_emulator", "wezterm start --"))
+    app_argv = sel.get("exec") if isinstance(sel, dict) else None
+    if app_argv:
+        return term + app_argv if sel.get("terminal") else app_argv
+    if cmd.startswith("EDT:"):
+        # "EDT:+LINE path" opens at a line (vim/nvim/nano/emacs/micro all take +LINE)
+        target, at = cmd[4:].strip(), []
+        if target.startswith("+"): at, target = [target.split(" ", 1)[0]], target.split(" ", 1)[1]
+        return term + shlex.split(settings.get('editor', 'nvim')) + at + [os.path.expanduser(target)]
+    if cmd.startswith("WEB:"):
+        return ["xdg-open", cmd[4:] if '://' in cmd[4:] else 'https://' + cmd[4:]]
+    if (os.path.basename(cmd.split()[0]) if cmd.split() else "") in CLI_ONLY or cmd.startswith("TERM:"):
+        payload = cmd[5:] if cmd.startswith("TERM:") else cmd
+        return term + ["bash", "-c", f"{payload}; echo; read"]
+    return cmd
+
+def _spawn(argv, quiet):
+    actions = [(os.POSIX_SPAWN_OPEN, fd, os.devnull, os.O_WRONLY, 0) for fd in (1, 2)] if quiet else []
+    return os.posix_spawnp(argv[0], argv, os.environ, file_actions=actions, setsid=True)
+
+def launch(cmd, quiet=False):
+    """
+    Starts `cmd` detached. argv lists and plain command strings are exec'd
+    directly via posix_spawn; only strings using shell syntax go through sh.
+    """
+    argv = cmd if isinstance(cmd, list) else None
+    if argv is None and not needs_shell(cmd):
+        try: argv = shlex.split(cmd)
+        except ValueError: argv = None
+    if argv:
+        with trace.span("launch.spawn", argv0=argv[0]):
+            try: return _spawn(argv, quiet)
+            except OSError: pass  # not on PATH / not executable: let the shell report it
+        cmd = shlex.join(argv)
+    out = subprocess.DEVNULL if quiet else None
+    with trace.span("launch.shell"):
+        return subprocess.Popen(cmd, shell=True, start_new_session=True, stdout=out, stderr=out).pid
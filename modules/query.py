@@ -0,0 +1,92 @@
+import os, math, heapq
+from collections import Counter
+from modules import daemon, frecency, scanner, trace
+
+MODES = ["all", "menu", "apps", "run", "config"]
+_index_cache = {}
+
+def _grams(text):
+    t = f"  {text.lower()} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+def _words(text):
+    return [w for w in text.lower().replace("/", " ").replace("-", " ").replace("_", " ").split() if w]
+
+def collect(mode, settings, weights, menu_idx):
+    """Candidate rows as (source, label, value, history namespace, history item)."""
+    rows = []
+    if mode in ("all", "menu"):
+        for flat, nid in menu_idx["by_flat"].items():
+            rows.append(("menu", flat, menu_idx["nodes"][nid]["val"], "HOME", flat))
+    if mode in ("all", "apps"):
+        for name, app in daemon.fetch("apps")["apps"].items():
+            rows.append(("apps", name, app["cmd"], "APPS", name))
+    if mode in ("all", "run"):
+        for b in dict.fromkeys([*frecency.items(weights, "RUN"), *daemon.fetch("bins")["bins"]]):
+            rows.append(("run", b, b, "RUN", b))
+    if mode in ("all", "config"):
+        for fp in scanner.get_config_files(settings):
+            rows.append(("config", os.path.basename(fp), f"EDT:{fp}", "CONFIG", fp))
+    return rows
+
+def build_index(labels):
+    """Trigram postings plus a word-prefix map (for 1-2 character queries)."""
+    tri, prefix = {}, {}
+    for i, label in enumerate(labels):
+        for g in _grams(label): tri.setdefault(g, []).append(i)
+        for w in _words(label):
+            for p in (w[:1], w[:2]): prefix.setdefault(p, set()).add(i)
+    return {"tri": tri, "prefix": prefix}
+
+def _quality(q, label):
+    l = label.lower()
+    if l == q: return 1.0
+    if l.startswith(q): return 0.8
+    if any(w.startswith(q) for w in _words(l)): return 0.6
+    if q in l: return 0.4
+    return 0.0
+
+@trace.timed("query.search")
+def search(text, mode="all", limit=10, rows=None, settings=None, weights=None, menu_idx=None):
+    """
+    Top `limit` matches for `text` across the menu, apps, binaries and config
+    files, scored by match quality plus history weight. Returns plain dicts.
+    Missing inputs are loaded through the daemon (or in-process).
+    """
+    if rows is None or weights is None:
+        warm = daemon.fetch("config", "state", "menu")
+        settings = settings if settings is not None else warm["config"].get("settings", {})
+        weights = weights if weights is not None else warm["state"].get("history", {})
+        menu_idx = menu_idx or warm["menu"]
+    if rows is None: rows = collect(mode, settings, weights, menu_idx)
+
+    if _index_cache.get("rows") is not rows:
+        _index_cache.update(rows=rows, index=build_index([r[1] for r in rows]))
+    index = _index_cache["index"]
+
+    q = text.strip().lower()
+    if not q: return []
+    if len(q) < 3:
+        # Too short for trigrams: word prefixes, else a plain substring scan
+        hits = index["prefix"].get(q) or [i for i, r in enumerate(rows) if q in r[1].lower()]
+        cands, need = {i: 1 for i in hits}, 1
+    else:
+        # Fuzzy: any row sharing at least half of the query's trigrams
+        grams = _grams(q)
+        cands = Counter(i for g in grams for i in index["tri"].get(g, ()))
+        need = max(1, math.ceil(len(grams) / 2))
+    n_grams = len(_grams(q))
+
+    scored = []
+    for i, hits in cands.items():
+        if hits < need: continue
+        src, label, value, ns, item = rows[i]
+        quality = _quality(q, label) or 0.3 * hits / n_grams
+        score = quality + 0.25 * math.log1p(frecency.score(weights, ns, item))
+        scored.append((score, i))
+    trace.note(items=len(rows), candidates=len(scored))
+
+    return [
+        {"source": rows[i][0], "label": rows[i][1], "value": rows[i][2], "score": round(s, 4)}
+        for s, i in heapq.nlargest(limit, scored)
+    ]
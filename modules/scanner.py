@@ -1,50 +1,264 @@
-import os, glob
+import os, threading, fnmatch
+from concurrent.futures import ThreadPoolExecutor, wait
+from modules import config, trace, launcher, engine
+
+# Comprehensive list of desktop file locations (later entries win on name clashes)
+APP_DIRS = [os.path.join(d, "applications") for d in config.DATA_DIRS] or [
+    "/usr/share/applications",
+    "/usr/local/share/applications",
+    os.path.expanduser("~/.local/share/applications"),
+    # System-wide Flatpaks
+    "/var/lib/flatpak/exports/share/applications",
+    # User-specific Flatpaks
+    os.path.expanduser("~/.local/share/flatpak/exports/share/applications"),
+]
+# Bump when the per-file record layout changes
+APPS_CACHE_VERSION = 5
+
+def _parse_desktop(entry):
+    """
+    Returns (name, icon, argv, terminal, workdir, dbus) for a .desktop file;
+    name is None if unusable. Exec= is pre-split into argv here so launching
+    needs no parsing. workdir (Path=) and dbus (DBusActivatable=) are kept so
+    entries relying on them can still go through gtk-launch.
+    """
+    name, icon, exec_line, terminal, workdir, dbus = None, None, None, False, "", False
+    try:
+        with open(entry, 'r') as f:
+            section = None
+            for line in f:
+                if line.startswith("["):
+                    # Only the main group; [Desktop Action ...] has its own Name/Exec
+                    if section: break
+                    section = line.strip()
+                    continue
+                key, _, val = line.partition("=")
+                if key == "Name": name = val.strip()
+                elif key == "Icon": icon = val.strip()
+                elif key == "Exec": exec_line = val.strip()
+                elif key == "Terminal": terminal = val.strip().lower() == "true"
+                elif key == "Path": workdir = val.strip()
+                elif key == "DBusActivatable": dbus = val.strip().lower() == "true"
+    except Exception:
+        return None, "system-run", None, False, "", False
+    # %i uses the real Icon= value (nothing when absent); system-run is display-only
+    argv = launcher.parse_exec(exec_line, name or "", icon or "", entry) if exec_line else None
+    return name, icon or "system-run", argv, terminal, workdir, dbus
+
+def _scan_app_dir(path, cached):
+    """
+    Re-indexes one applications dir. Files whose mtime matches the
+    cached record are reused, only new/changed ones are opened.
+    """
+    old_files = cached.get("files", {}) if cached else {}
+    files = {}
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return {}
+    for entry in entries:
+        if not entry.name.endswith(".desktop"): continue
+        try: mtime = entry.stat().st_mtime
+        except OSError: continue
+        old = old_files.get(entry.name)
+        if old and old[0] == mtime:
+            files[entry.name] = old
+        else:
+            files[entry.name] = [mtime, *_parse_desktop(entry.path)]
+    return files
+
+@trace.timed("scanner.apps")
+def get_system_apps(cached_only=False):
+    """
+    Desktop entries from APP_DIRS, served from a persistent index.
+    Each dir is validated by its mtime, so a warm call is one stat per dir.
+    cached_only returns the last index as-is, without touching the dirs.
+    """
+    index = config.load_cache("apps")
+    if index.get("v") != APPS_CACHE_VERSION: index = {}
+    dirs, dirty, rescanned = index.get("dirs", {}), False, 0
+
+    for path in ([] if cached_only else APP_DIRS):
+        try: mtime = os.stat(path).st_mtime
+        except OSError:
+            if dirs.pop(path, None) is not None: dirty = True
+            continue
+        cached = dirs.get(path)
+        if cached and cached.get("mtime") == mtime: continue
+        dirs[path] = {"mtime": mtime, "files": _scan_app_dir(path, cached)}
+        dirty, rescanned = True, rescanned + 1
+
+    if dirty: config.save_cache("apps", {"v": APPS_CACHE_VERSION, "dirs": dirs})
 
-def get_system_apps():
     apps = {}
-    # Comprehensive list of desktop file locations
-    paths = [
-        "/usr/share/applications/*.desktop",
-        "/usr/local/share/applications/*.desktop",
-        os.path.expanduser("~/.local/share/applications/*.desktop"),
-        # System-wide Flatpaks
-        "/var/lib/flatpak/exports/share/applications/*.desktop",
-        # User-specific Flatpaks (The path you requested)
-        os.path.expanduser("~/.local/share/flatpak/exports/share/applications/*.desktop")
-    ]
-    
-    for path_glob in paths:
-        for entry in glob.glob(path_glob):
-            # The desktop_id is used by gtk-launch to trigger the app correctly
-            d_id = os.path.basename(entry)
-            try:
-                with open(entry, 'r') as f:
-                    name, icon = None, "system-run"
-                    for line in f:
-                        if line.startswith("Name="): 
-                            name = line.split("=")[1].strip()
-                        elif line.startswith("Icon="): 
-                            icon = line.split("=")[1].strip()
-                        # Optimization: stop reading if we have both
-                        if name and icon != "system-run":
-                            break
-                    
-                    if name: 
-                        # We use the filename (desktop_id) for gtk-launch
-                        # as it's more reliable for Flatpaks than parsing Exec=
-                        apps[name] = {"cmd": f"gtk-launch {d_id}", "icon": icon}
-            except Exception:
-                continue
+    for path in APP_DIRS:
+        for d_id, (_, name, icon, argv, terminal, workdir, dbus) in sorted(dirs.get(path, {}).get("files", {}).items()):
+            # gtk-launch stays for entries the direct path can't honour: Exec= that
+            # couldn't be parsed, a working dir (Path=) or D-Bus activation
+            if workdir or dbus: argv = None
+            if name: apps[name] = {"cmd": f"gtk-launch {d_id}", "icon": icon, "exec": argv, "terminal": terminal}
+    trace.note(items=len(apps), dirs_hit=len(dirs) - rescanned, dirs_miss=rescanned)
     return apps
 
-def get_binaries():
+def _scan_bin_dir(path):
+    bins = []
+    try:
+        for entry in os.scandir(path):
+            if entry.is_file() and os.access(entry.path, os.X_OK):
+                bins.append(entry.name)
+    except Exception:
+        pass
+    return bins
+
+def _refresh_bin_dirs(dirs, stale):
+    for path, mtime in stale.items():
+        dirs[path] = {"mtime": mtime, "bins": _scan_bin_dir(path)}
+    config.save_cache("bins", {"dirs": dirs})
+
+@trace.timed("scanner.bins")
+def get_binaries(cached_only=False):
+    """
+    Executables on $PATH, served from a per-directory index keyed by mtime.
+    Unknown dirs are scanned inline; changed dirs are served stale and
+    re-scanned in the background so the next launch picks them up.
+    cached_only skips the stat/scan pass entirely.
+    """
+    index = config.load_cache("bins")
+    cached_dirs, dirs = index.get("dirs", {}), {}
+    if cached_only:
+        paths = dict.fromkeys(os.environ.get("PATH", "").split(os.pathsep))
+        return sorted({b for p, d in cached_dirs.items() if p in paths for b in d.get("bins", [])})
+    stale, dirty, missed = {}, False, 0
+
+    for path in dict.fromkeys(os.environ.get("PATH", "").split(os.pathsep)):
+        try: mtime = os.stat(path).st_mtime
+        except OSError: continue
+        cached = cached_dirs.get(path)
+        if cached is None:
+            dirs[path] = {"mtime": mtime, "bins": _scan_bin_dir(path)}
+            dirty, missed = True, missed + 1
+        else:
+            dirs[path] = cached
+            if cached.get("mtime") != mtime: stale[path] = mtime
+
     bins = set()
-    for path in os.environ.get("PATH", "").split(os.pathsep):
-        if os.path.isdir(path):
+    for d in dirs.values(): bins.update(d.get("bins", []))
+
+    trace.note(items=len(bins), dirs_hit=len(dirs) - missed - len(stale), dirs_stale=len(stale), dirs_miss=missed)
+    if stale:
+        # Non-daemon: finishes while rofi is open, before the interpreter exits
+        threading.Thread(target=_refresh_bin_dirs, args=(dict(dirs), stale)).start()
+    elif dirty or len(dirs) != len(cached_dirs):
+        config.save_cache("bins", {"dirs": dirs})
+    return sorted(bins)
+
+# --- CONFIG EDITOR INDEX ---
+CONFIG_IGNORE = [".git", "node_modules", "*cache*", "__pycache__"]
+
+def _list_dir(path, cached):
+    """Returns (mtime, files, subdirs) for a dir, reusing the cached listing if its mtime matches."""
+    try: mtime = os.stat(path).st_mtime
+    except OSError: return None
+    if cached and cached[0] == mtime: return cached
+    files, subdirs = [], []
+    try:
+        for entry in os.scandir(path):
             try:
-                for entry in os.scandir(path):
-                    if entry.is_file() and os.access(entry.path, os.X_OK):
-                        bins.add(entry.name)
-            except Exception:
-                continue
-    return sorted(list(bins))
\ No newline at end of file
+                if entry.is_dir(follow_symlinks=False): subdirs.append(entry.name)
+                elif entry.is_file(): files.append(entry.name)
+            except OSError: continue
+    except OSError:
+        return None
+    return [mtime, sorted(files), sorted(subdirs)]
+
+def _walk_root(root, old, ignore, max_depth, max_files):
+    """Walks one editor root, pruning ignored dirs before descending."""
+    seen, found = {}, []
+    stack = [(root, 0)]
+    while stack and len(found) < max_files:
+        path, depth = stack.pop()
+        listing = _list_dir(path, old.get(path))
+        if listing is None: continue
+        seen[path] = listing
+        _, files, subdirs = listing
+        for f in files:
+            if not any(fnmatch.fnmatch(f, g) for g in ignore): found.append(os.path.join(path, f))
+        if depth < max_depth:
+            for d in reversed(subdirs):
+                if not any(fnmatch.fnmatch(d, g) for g in ignore): stack.append((os.path.join(path, d), depth + 1))
+    return seen, found[:max_files]
+
+@trace.timed("scanner.configs")
+def get_config_files(settings, cached_only=False):
+    """
+    Files for the Config Editor: cmd-center's own config plus everything under
+    `editor_paths`. Roots are walked concurrently and every directory listing
+    is cached by mtime, so re-opening only re-lists dirs that changed.
+    Tunables: editor_ignore (globs), editor_max_depth, editor_max_files.
+    cached_only returns the previous result without walking anything.
+    """
+    if cached_only:
+        return {fp: f"EDT:{fp}" for fp in config.load_cache("configs").get("files", [])}
+    ignore = settings.get("editor_ignore", CONFIG_IGNORE)
+    max_depth = settings.get("editor_max_depth", 8)
+    max_files = settings.get("editor_max_files", 5000)
+
+    files, roots = {}, []
+    for p in [config.CONFIG_PATH, *settings.get("editor_paths", [])]:
+        full_b = os.path.expanduser(p)
+        if os.path.isfile(full_b): files[full_b] = f"EDT:{full_b}"
+        elif os.path.isdir(full_b): roots.append(full_b.rstrip(os.sep) or os.sep)
+    cache = config.load_cache("configs")
+    if not roots:
+        if cache.get("files") != list(files): config.save_cache("configs", {"dirs": {}, "files": list(files)})
+        return files
+
+    old = cache.get("dirs", {})
+    with ThreadPoolExecutor(max_workers=min(8, len(roots))) as pool:
+        results = list(pool.map(lambda r: _walk_root(r, old, ignore, max_depth, max_files), roots))
+
+    dirs = {}
+    for seen, found in results:
+        dirs.update(seen)
+        for fp in found:
+            if len(files) >= max_files: break
+            files[fp] = f"EDT:{fp}"
+    reused = sum(1 for p, l in dirs.items() if old.get(p) is l)
+    trace.note(items=len(files), dirs_hit=reused, dirs_miss=len(dirs) - reused)
+    if dirs != old or cache.get("files") != list(files):
+        config.save_cache("configs", {"dirs": dirs, "files": list(files)})
+    return files
+
+# --- ENTRIES ---
+def app_entry(name, app, key=(0.0, ""), label=None):
+    return engine.Entry("APPS", name, label or name, app.get("icon", ""), app, key)
+
+def bin_entry(name, icon, key=(0.0, ""), label=None):
+    return engine.Entry("RUN", name, label or name, icon, name, key)
+
+def config_entry(fp, key=(0.0, ""), home=os.path.expanduser("~")):
+    return engine.Entry("CONFIG", fp, f"📄 {os.path.basename(fp)}    ({fp.replace(home, '~')})", command=f"EDT:{fp}", key=key)
+
+# --- MULTI-SOURCE GATHERING ---
+def gather(loaders, budget):
+    """
+    Runs {name: (loader, fallback)} concurrently and waits at most `budget`
+    seconds. Sources that miss the budget are served by their fallback
+    (typically the cached_only variant) while the loader keeps refreshing
+    the on-disk cache in the background.
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, len(loaders)))
+    futures = {name: pool.submit(fn) for name, (fn, _) in loaders.items()}
+    wait(futures.values(), timeout=budget)
+    pool.shutdown(wait=False)
+
+    results, late = {}, []
+    for name, fut in futures.items():
+        if fut.done() and fut.exception() is None:
+            results[name] = fut.result()
+        else:
+            late.append(name)
+            try: results[name] = loaders[name][1]()
+            except Exception: results[name] = {}
+    trace.note(late=late)
+    return results
@@ -0,0 +1,73 @@
+import os, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules import trace
+
+DEFAULT_LIMIT = 4
+
+def steps(profile):
+    """
+    Normalises profile entries (command strings or {"cmd", "name", "after",
+    "delay", "wait"} dicts) to full step dicts with unique names. A dict
+    without "cmd" keeps cmd None, which run() reports as failed.
+    """
+    out, seen = [], set()
+    for i, s in enumerate(profile):
+        if not isinstance(s, dict): s = {"cmd": s}
+        cmd = s.get("cmd")
+        name = s.get("name") or (cmd if isinstance(cmd, str) else f"#{i}")
+        if name in seen: name = f"{name}#{i}"
+        seen.add(name)
+        after = s.get("after", [])
+        out.append({"name": name, "cmd": cmd, "after": [after] if isinstance(after, str) else list(after),
+                    "delay": float(s.get("delay", 0)), "wait": bool(s.get("wait", False))})
+    return out
+
+def _step(s, start):
+    with trace.span("profile.step", name=s["name"]):
+        pid = start(s["cmd"])
+    if s["wait"] and isinstance(pid, int):
+        _, status = os.waitpid(pid, 0)
+        if status: raise RuntimeError(f"{s['name']} exited with status {status >> 8}")
+
+@trace.timed("profile.run")
+def run(profile, start, limit=DEFAULT_LIMIT):
+    """
+    Launches profile steps through start(cmd) with at most `limit` in flight.
+    Independent steps go out together; a step with `after` waits until those
+    steps are done (started, or exited for wait=true ones), then its `delay`.
+    Delays are timed here rather than slept in a worker, so they never hold
+    a slot. Steps without a cmd, naming an unknown step in `after`, behind a
+    failed dependency, or in a cycle are not started and count as failed.
+    Returns (done, failed) step names.
+    """
+    todo = {s["name"]: s for s in steps(profile)}
+    names, limit = set(todo), max(1, limit)
+    unknown = sorted({d for s in todo.values() for d in s["after"] if d not in names})
+    done, failed, running, ready_at = [], [], {}, {}
+    with ThreadPoolExecutor(max_workers=limit) as pool:
+        while todo or running:
+            now = time.monotonic()
+            for name, s in list(todo.items()):
+                if s["cmd"] is None or any(d in failed or d not in names for d in s["after"]):
+                    failed.append(todo.pop(name)["name"])
+                    continue
+                if name not in ready_at and all(d in done for d in s["after"]):
+                    ready_at[name] = now + s["delay"]
+                if len(running) < limit and ready_at.get(name, now + 1) <= now:
+                    running[pool.submit(_step, s, start)] = todo.pop(name)
+            waiting = [ready_at[n] for n in todo if n in ready_at]
+            if not running and not waiting:
+                failed += list(todo)  # what's left waits on itself
+                break
+            # Wake for the next finished step or the next delay to run out; with
+            # every slot taken a due step can't start anyway, so only a finish counts
+            timeout = max(0, min(waiting) - time.monotonic()) if waiting and len(running) < limit else None
+            if not running:
+                time.sleep(timeout)
+                continue
+            finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in finished:
+                s = running.pop(f)
+                (done if f.exception() is None else failed).append(s["name"])
+    trace.note(done=len(done), failed=failed, **({"unknown_after": unknown} if unknown else {}))
+    return done, failed
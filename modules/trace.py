@@ -0,0 +1,93 @@
+import os, json, time, atexit, threading, functools
+from contextlib import contextmanager
+from modules import config
+
+# Enabled by `--trace` or CMD_CENTER_TRACE=1; records are buffered and
+# appended as JSONL on exit, or earlier once the buffer holds FLUSH_RECORDS
+# or is FLUSH_SECONDS old (long-lived daemons), rotating past MAX_BYTES.
+TRACE_PATH = os.path.join(config.CACHE_DIR, "trace.jsonl")
+MAX_BYTES = 1024 * 1024
+FLUSH_RECORDS = 256
+FLUSH_SECONDS = 5.0
+
+enabled = os.environ.get("CMD_CENTER_TRACE", "") not in ("", "0")
+_run = f"{os.getpid()}-{int(time.time())}"
+_records, _lock, _local = [], threading.Lock(), threading.local()
+
+def enable():
+    global enabled
+    enabled = True
+
+@contextmanager
+def span(stage, **fields):
+    """Times a block; note() inside it attaches counts / cache hits to the record."""
+    if not enabled:
+        yield fields
+        return
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(fields)
+    t = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        stack.pop()
+        mark(stage, t, **fields)
+
+def mark(stage, t0, **fields):
+    """Records `stage` as having run since perf_counter() value t0."""
+    if not enabled: return
+    rec = {"run": _run, "stage": stage, "ms": round((time.perf_counter() - t0) * 1e3, 3), "ts": time.time(), **fields}
+    with _lock:
+        _records.append(rec)
+        due = len(_records) >= FLUSH_RECORDS or rec["ts"] - _records[0]["ts"] >= FLUSH_SECONDS
+    if due: flush()
+
+def note(**fields):
+    """Adds fields to the innermost open span (no-op when tracing is off)."""
+    stack = _local.__dict__.get("stack")
+    if enabled and stack: stack[-1].update(fields)
+
+def timed(stage):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            if not enabled: return fn(*a, **kw)
+            with span(stage): return fn(*a, **kw)
+        return wrapper
+    return deco
+
+@atexit.register
+def flush():
+    with _lock:
+        if not _records: return
+        data, _records[:] = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in _records), []
+    try:
+        os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+        if os.path.exists(TRACE_PATH) and os.path.getsize(TRACE_PATH) > MAX_BYTES:
+            os.replace(TRACE_PATH, TRACE_PATH + ".1")
+        with open(TRACE_PATH, 'a') as f: f.write(data)
+    except OSError:
+        pass
+
+# --- STATS ---
+def _pct(vals, p):
+    return vals[min(len(vals) - 1, int(round(p / 100 * (len(vals) - 1))))]
+
+def summary(c):
+    """p50/p95 per stage over the current and rotated trace logs."""
+    per = {}
+    for path in (TRACE_PATH + ".1", TRACE_PATH):
+        try:
+            with open(path) as f:
+                for line in f:
+                    try: rec = json.loads(line)
+                    except ValueError: continue
+                    per.setdefault(rec.get("stage", "?"), []).append(rec.get("ms", 0))
+        except OSError:
+            continue
+    if not per: return f"No trace records yet. Run with {c['green']}--trace{c['reset']} or CMD_CENTER_TRACE=1."
+    lines = [f"{c['bold']}{'stage':<24}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{c['reset']}"]
+    for stage, vals in sorted(per.items()):
+        vals.sort()
+        lines.append(f"{stage:<24}{len(vals):>6}{_pct(vals, 50):>10.1f}{_pct(vals, 95):>10.1f}")
+    return "\n".join(lines)